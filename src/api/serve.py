@@ -0,0 +1,509 @@
+# src/api/serve.py
+
+"""
+Multi-process launcher for the Face Detection API.
+
+Each worker process holds its own MTCNN detector, with explicit TensorFlow
+thread pools and optional CPU pinning. The topology comes from the environment
+(overridable on the command line):
+
+    API_WORKERS          number of worker processes (default: 1)
+    TF_INTRA_OP_THREADS  TensorFlow intra-op threads per worker (0 = TF default)
+    TF_INTER_OP_THREADS  TensorFlow inter-op threads per worker (0 = TF default)
+    API_CPU_AFFINITY     "" (no pinning), "auto" (contiguous CPU blocks per worker)
+                         or explicit per-worker sets, e.g. "0-3;4-7"
+
+Usage:
+
+    python -m src.api.serve --host 0.0.0.0 --port 8000
+    python -m src.api.serve tune --image test_image.jpg --objective latency
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import signal
+import statistics
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional, Set
+
+APP_IMPORT = "src.api.main:app"
+# au-delà de MAX_RESTARTS relances en RESTART_WINDOW secondes, le lanceur s'arrête en erreur
+MAX_RESTARTS = 5
+RESTART_WINDOW = 60.0
+# délai maximal avant de relancer un worker qui vient de mourir
+MAX_RESTART_BACKOFF = 30.0
+
+
+@dataclass(frozen=True)
+class WorkerTopology:
+    workers: int = 1
+    intra_op_threads: int = 0
+    inter_op_threads: int = 0
+    cpu_affinity: str = ""
+
+    def __post_init__(self):
+        if self.workers < 1:
+            raise ValueError(f"API_WORKERS must be >= 1 (got {self.workers}).")
+        if self.intra_op_threads < 0:
+            raise ValueError(f"TF_INTRA_OP_THREADS must be >= 0 (got {self.intra_op_threads}).")
+        if self.inter_op_threads < 0:
+            raise ValueError(f"TF_INTER_OP_THREADS must be >= 0 (got {self.inter_op_threads}).")
+
+    @classmethod
+    def from_env(cls) -> "WorkerTopology":
+        return cls(
+            workers=int(os.environ.get("API_WORKERS") or 1),
+            intra_op_threads=int(os.environ.get("TF_INTRA_OP_THREADS") or 0),
+            inter_op_threads=int(os.environ.get("TF_INTER_OP_THREADS") or 0),
+            cpu_affinity=os.environ.get("API_CPU_AFFINITY", "").strip(),
+        )
+
+    def as_env(self) -> List[str]:
+        return [
+            f"API_WORKERS={self.workers}",
+            f"TF_INTRA_OP_THREADS={self.intra_op_threads}",
+            f"TF_INTER_OP_THREADS={self.inter_op_threads}",
+            f"API_CPU_AFFINITY={self.cpu_affinity}",
+        ]
+
+
+# ---------------------- CPU pinning ---------------------- #
+
+def available_cpus() -> List[int]:
+    """CPUs this process is allowed to run on (respects container cpusets)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_cpu_set(spec: str) -> Set[int]:
+    """
+    Parse a CPU list such as "0-3,8" into {0, 1, 2, 3, 8}.
+    """
+    cpus: Set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            cpus.update(range(int(start), int(end) + 1))
+        else:
+            cpus.add(int(part))
+    if not cpus:
+        raise ValueError(f"Empty CPU set: {spec!r}")
+    return cpus
+
+
+def worker_cpu_sets(
+    topology: WorkerTopology,
+    cpus: Optional[List[int]] = None,
+) -> List[Optional[Set[int]]]:
+    """
+    Return the CPU set of each worker (None = no pinning).
+    Raises ValueError if API_CPU_AFFINITY is malformed or names CPUs outside `cpus`.
+    """
+    spec = topology.cpu_affinity
+    if not spec:
+        return [None] * topology.workers
+
+    cpus = cpus if cpus is not None else available_cpus()
+    if spec == "auto":
+        per_worker = max(1, len(cpus) // topology.workers)
+        sets: List[Optional[Set[int]]] = []
+        for idx in range(topology.workers):
+            # plus de workers que de CPUs : on reboucle sur la liste
+            start = (idx * per_worker) % len(cpus)
+            sets.append(set(cpus[start:start + per_worker]))
+        return sets
+
+    groups = [g for g in spec.split(";") if g.strip()]
+    if len(groups) != topology.workers:
+        raise ValueError(
+            f"API_CPU_AFFINITY defines {len(groups)} CPU sets for {topology.workers} workers."
+        )
+    sets = [parse_cpu_set(g) for g in groups]
+    unavailable = set().union(*sets) - set(cpus)
+    if unavailable:
+        raise ValueError(
+            f"API_CPU_AFFINITY uses CPUs {sorted(unavailable)} not available to this process "
+            f"(available: {cpus})."
+        )
+    return sets
+
+
+def apply_worker_settings(topology: WorkerTopology, cpu_set: Optional[Set[int]]) -> None:
+    """
+    Configure the current process before the detector is imported:
+    TensorFlow thread pools are read by src.models.MTCNN at import time.
+    """
+    os.environ["TF_INTRA_OP_THREADS"] = str(topology.intra_op_threads)
+    os.environ["TF_INTER_OP_THREADS"] = str(topology.inter_op_threads)
+    if cpu_set and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpu_set)
+
+
+# ---------------------- Serving ---------------------- #
+
+def _serve_worker(topology, cpu_set, sockets, host, port, ready) -> None:
+    apply_worker_settings(topology, cpu_set)
+
+    import uvicorn
+
+    config = uvicorn.Config(APP_IMPORT, host=host, port=port)
+    server = uvicorn.Server(config)
+
+    def _notify_ready():
+        # server.started passe à True une fois l'app importée et le lifespan démarré
+        while not server.started:
+            if server.should_exit:
+                return
+            time.sleep(0.1)
+        ready.set()
+
+    threading.Thread(target=_notify_ready, daemon=True).start()
+    server.run(sockets=sockets)
+
+
+def serve(topology: WorkerTopology, host: str = "0.0.0.0", port: int = 8000) -> None:
+    """
+    Start `topology.workers` processes sharing one listening socket.
+
+    A worker that dies after it reported ready is restarted with the same CPU set,
+    with exponential backoff. The launcher exits with code 1 if a worker dies before
+    it is ready (startup failure) or after MAX_RESTARTS restarts in RESTART_WINDOW seconds.
+    """
+    import uvicorn
+
+    cpu_sets = worker_cpu_sets(topology)
+
+    if topology.workers == 1:
+        apply_worker_settings(topology, cpu_sets[0])
+        uvicorn.run(APP_IMPORT, host=host, port=port)
+        return
+
+    sock = uvicorn.Config(APP_IMPORT, host=host, port=port).bind_socket()
+    ctx = multiprocessing.get_context("spawn")
+    processes: List = [None] * topology.workers
+    ready_events: List = [None] * topology.workers
+    respawn_at: List[Optional[float]] = [None] * topology.workers
+    restarts: List[deque] = [deque() for _ in range(topology.workers)]
+    state = {"stopping": False, "exit_code": 0}
+
+    def _spawn(idx: int) -> None:
+        ready = ctx.Event()
+        proc = ctx.Process(
+            target=_serve_worker,
+            args=(topology, cpu_sets[idx], [sock], host, port, ready),
+            name=f"api-worker-{idx}",
+        )
+        proc.start()
+        processes[idx] = proc
+        ready_events[idx] = ready
+        respawn_at[idx] = None
+        print(f"Worker {idx} started (pid={proc.pid}, cpus={cpu_sets[idx] or 'all'})")
+
+    def _stop_all() -> None:
+        state["stopping"] = True
+        for proc in processes:
+            if proc is not None and proc.is_alive():
+                proc.terminate()
+
+    def _fail(message: str) -> None:
+        print(message)
+        state["exit_code"] = 1
+        _stop_all()
+
+    def _shutdown(signum, frame):
+        _stop_all()
+
+    signal.signal(signal.SIGTERM, _shutdown)
+    signal.signal(signal.SIGINT, _shutdown)
+
+    for idx in range(topology.workers):
+        _spawn(idx)
+
+    try:
+        # supervision : un worker mort (segfault, OOM kill...) est relancé avec le même CPU set
+        while not state["stopping"]:
+            time.sleep(1.0)
+            now = time.monotonic()
+            for idx, proc in enumerate(processes):
+                if state["stopping"]:
+                    break
+                if respawn_at[idx] is not None:
+                    if now >= respawn_at[idx]:
+                        _spawn(idx)
+                    continue
+                if proc.is_alive():
+                    continue
+
+                if not ready_events[idx].is_set():
+                    _fail(f"Worker {idx} exited during startup (code {proc.exitcode}), stopping.")
+                    break
+
+                history = restarts[idx]
+                while history and now - history[0] > RESTART_WINDOW:
+                    history.popleft()
+                if len(history) >= MAX_RESTARTS:
+                    _fail(
+                        f"Worker {idx} exited (code {proc.exitcode}) after {len(history)} restarts "
+                        f"in {RESTART_WINDOW:.0f}s, stopping."
+                    )
+                    break
+                history.append(now)
+                delay = min(MAX_RESTART_BACKOFF, 2.0 ** (len(history) - 1))
+                print(f"Worker {idx} exited (code {proc.exitcode}), restarting in {delay:.0f}s.")
+                respawn_at[idx] = now + delay
+    finally:
+        for proc in processes:
+            proc.join()
+        sock.close()
+
+    if state["exit_code"]:
+        sys.exit(state["exit_code"])
+
+
+# ---------------------- Auto-tuning ---------------------- #
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    topology: WorkerTopology
+    throughput: float
+    p50_ms: float
+    p95_ms: float
+    error: Optional[str] = None
+
+
+def _powers_of_two_up_to(n: int) -> List[int]:
+    values = []
+    value = 1
+    while value <= n:
+        values.append(value)
+        value *= 2
+    if n not in values:
+        values.append(n)
+    return values
+
+
+def candidate_topologies(cpu_count: int, pin: bool = True) -> List[WorkerTopology]:
+    """
+    Candidate (processes x threads) layouts that do not oversubscribe `cpu_count`.
+    """
+    candidates = []
+    for workers in _powers_of_two_up_to(cpu_count):
+        for threads in _powers_of_two_up_to(cpu_count // workers):
+            candidates.append(
+                WorkerTopology(
+                    workers=workers,
+                    intra_op_threads=threads,
+                    inter_op_threads=min(2, threads),
+                    cpu_affinity="auto" if pin else "",
+                )
+            )
+    return candidates
+
+
+def _bench_worker(topology, cpu_set, image_bytes, n_calls, barrier, results, timeout) -> None:
+    try:
+        apply_worker_settings(topology, cpu_set)
+
+        from src.models.MTCNN import detect_faces
+
+        # warm-up : compilation des graphes et allocation des buffers
+        detect_faces(image_bytes)
+        barrier.wait(timeout=timeout)
+
+        latencies = []
+        start = time.monotonic()
+        for _ in range(n_calls):
+            t0 = time.perf_counter()
+            detect_faces(image_bytes)
+            latencies.append(time.perf_counter() - t0)
+        results.put(("ok", start, time.monotonic(), latencies))
+    except Exception as e:
+        # débloque les autres workers encore en attente sur la barrière
+        barrier.abort()
+        results.put(("error", f"{type(e).__name__}: {e}"))
+
+
+def benchmark_topology(
+    topology: WorkerTopology,
+    image_bytes: bytes,
+    total_requests: int = 64,
+    timeout: float = 600.0,
+) -> BenchmarkResult:
+    """
+    Run `total_requests` detections spread over the topology's worker processes,
+    each worker keeping one request in flight (as a uvicorn worker does).
+    A worker that fails, crashes or exceeds `timeout` marks the layout as failed.
+    """
+    cpu_sets = worker_cpu_sets(topology)
+    calls_per_worker = max(1, -(-total_requests // topology.workers))
+
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(topology.workers)
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(
+            target=_bench_worker,
+            args=(topology, cpu_sets[idx], image_bytes, calls_per_worker, barrier, results, timeout),
+        )
+        for idx in range(topology.workers)
+    ]
+    for proc in processes:
+        proc.start()
+
+    samples = []
+    error: Optional[str] = None
+    deadline = time.monotonic() + timeout
+    try:
+        while len(samples) < len(processes) and error is None:
+            try:
+                message = results.get(timeout=1.0)
+            except queue.Empty:
+                crashed = [p for p in processes if p.exitcode not in (None, 0)]
+                if crashed:
+                    error = f"worker exited with code {crashed[0].exitcode}"
+                elif time.monotonic() > deadline:
+                    error = f"timed out after {timeout:.0f}s"
+                continue
+            if message[0] == "error":
+                error = message[1]
+            else:
+                samples.append(message[1:])
+    finally:
+        for proc in processes:
+            if error is not None and proc.is_alive():
+                proc.terminate()
+            proc.join()
+
+    if error is not None:
+        return BenchmarkResult(topology, 0.0, float("inf"), float("inf"), error=error)
+
+    started = min(s[0] for s in samples)
+    finished = max(s[1] for s in samples)
+    latencies = sorted(lat for s in samples for lat in s[2])
+
+    return BenchmarkResult(
+        topology=topology,
+        throughput=len(latencies) / max(finished - started, 1e-9),
+        p50_ms=statistics.median(latencies) * 1000,
+        p95_ms=latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000,
+    )
+
+
+def select_best(results: List[BenchmarkResult], objective: str) -> BenchmarkResult:
+    succeeded = [r for r in results if r.error is None]
+    if not succeeded:
+        raise RuntimeError("Every candidate layout failed.")
+    if objective == "throughput":
+        return max(succeeded, key=lambda r: r.throughput)
+    if objective == "latency":
+        return min(succeeded, key=lambda r: r.p95_ms)
+    raise ValueError(f"Unknown objective: {objective}")
+
+
+def validate_image(image_bytes: bytes) -> None:
+    """Raise ValueError if `image_bytes` cannot be decoded as an image."""
+    from io import BytesIO
+    from PIL import Image
+
+    try:
+        Image.open(BytesIO(image_bytes)).convert("RGB")
+    except Exception as e:
+        raise ValueError(f"Invalid benchmark image: {e}") from e
+
+
+def tune(
+    image_bytes: bytes,
+    objective: str = "throughput",
+    total_requests: int = 64,
+    pin: bool = True,
+) -> BenchmarkResult:
+    validate_image(image_bytes)
+
+    cpu_count = len(available_cpus())
+    results = []
+
+    print(f"{'workers':>7} {'intra':>5} {'inter':>5} {'img/s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for topology in candidate_topologies(cpu_count, pin=pin):
+        result = benchmark_topology(topology, image_bytes, total_requests)
+        results.append(result)
+        if result.error is not None:
+            print(
+                f"{topology.workers:>7} {topology.intra_op_threads:>5} {topology.inter_op_threads:>5} "
+                f"FAILED: {result.error}"
+            )
+            continue
+        print(
+            f"{topology.workers:>7} {topology.intra_op_threads:>5} {topology.inter_op_threads:>5} "
+            f"{result.throughput:>8.2f} {result.p50_ms:>8.1f} {result.p95_ms:>8.1f}"
+        )
+
+    best = select_best(results, objective)
+    print(f"\nBest layout for {objective} on {cpu_count} CPUs:")
+    for line in best.topology.as_env():
+        print(f"  {line}")
+    return best
+
+
+# ---------------------- CLI ---------------------- #
+
+def _parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Face Detection API launcher.")
+    try:
+        env = WorkerTopology.from_env()
+    except ValueError as e:
+        parser.error(f"invalid worker topology in environment: {e}")
+
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=env.workers)
+    parser.add_argument("--intra-op-threads", type=int, default=env.intra_op_threads)
+    parser.add_argument("--inter-op-threads", type=int, default=env.inter_op_threads)
+    parser.add_argument("--cpu-affinity", default=env.cpu_affinity)
+
+    subparsers = parser.add_subparsers(dest="command")
+    tune_parser = subparsers.add_parser("tune", help="Benchmark worker layouts on this machine.")
+    tune_parser.add_argument("--image", required=True, help="Image used for the benchmark")
+    tune_parser.add_argument("--objective", choices=["throughput", "latency"], default="throughput")
+    tune_parser.add_argument("--requests", type=int, default=64, help="Detections per layout")
+    tune_parser.add_argument("--no-pin", action="store_true", help="Benchmark without CPU pinning")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = _parse_args(argv)
+
+    if args.command == "tune":
+        try:
+            with open(args.image, "rb") as f:
+                image_bytes = f.read()
+            tune(image_bytes, objective=args.objective, total_requests=args.requests, pin=not args.no_pin)
+        except (OSError, ValueError, RuntimeError) as e:
+            sys.exit(f"Tuning failed: {e}")
+        return
+
+    try:
+        topology = WorkerTopology(
+            workers=args.workers,
+            intra_op_threads=args.intra_op_threads,
+            inter_op_threads=args.inter_op_threads,
+            cpu_affinity=args.cpu_affinity,
+        )
+        worker_cpu_sets(topology)
+    except ValueError as e:
+        sys.exit(f"Invalid worker topology: {e}")
+    serve(topology, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
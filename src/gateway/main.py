@@ -0,0 +1,378 @@
+# src/gateway/main.py
+
+"""
+Cache-affinity gateway in front of several backend replicas.
+
+Each request is hashed on its path, query parameters and uploaded file content,
+then forwarded to a replica chosen on a consistent-hash ring, so identical
+images land on the same replica (and its warm caches). Routing uses bounded
+loads: a replica already above `load_factor` x the average in-flight load is
+skipped for the next one on the ring. Unhealthy replicas are ejected after
+`max_failures` consecutive failures and re-admitted once `/health` answers again.
+With health checks disabled (`health_interval <= 0`) nothing could re-admit them,
+so replicas are never ejected: a failing replica is simply skipped per request.
+
+    GATEWAY_REPLICAS=http://backend-1:8000,http://backend-2:8000 \
+        uvicorn src.gateway.main:app --port 8000
+
+For local experiments, replicas can be in-process ASGI apps:
+
+    replicas = {
+        "r1": httpx.AsyncClient(transport=httpx.ASGITransport(app=api_app), base_url="http://r1"),
+        "r2": httpx.AsyncClient(transport=httpx.ASGITransport(app=api_app), base_url="http://r2"),
+    }
+    gateway = create_app(replicas, health_interval=0)
+"""
+
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import statistics
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response
+from starlette.datastructures import UploadFile
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from starlette.formparsers import MultiPartException
+
+from src.gateway.ring import HashRing
+
+GATEWAY_REPLICAS = [u.strip() for u in os.environ.get("GATEWAY_REPLICAS", "").split(",") if u.strip()]
+VNODES = int(os.environ.get("GATEWAY_VNODES", "100"))
+LOAD_FACTOR = float(os.environ.get("GATEWAY_LOAD_FACTOR", "1.25"))
+HEALTH_INTERVAL = float(os.environ.get("GATEWAY_HEALTH_INTERVAL", "5"))
+MAX_FAILURES = int(os.environ.get("GATEWAY_MAX_FAILURES", "3"))
+# nombre de clés récentes gardées pour estimer le taux de hit des caches des replicas
+RECENT_KEYS = 10_000
+
+logger = logging.getLogger(__name__)
+
+HOP_BY_HOP_HEADERS = {
+    "connection",
+    "keep-alive",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "transfer-encoding",
+    "upgrade",
+}
+# content-length est recalculé par httpx à partir du body transmis
+REQUEST_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {"host", "content-length"}
+# httpx a déjà décodé resp.content : content-encoding ne s'applique plus
+RESPONSE_EXCLUDED_HEADERS = HOP_BY_HOP_HEADERS | {"content-length", "content-encoding"}
+
+
+class Replica:
+    def __init__(self, name: str, client: httpx.AsyncClient):
+        self.name = name
+        self.client = client
+        self.healthy = True
+        self.failures = 0
+        self.in_flight = 0
+        self.requests = 0
+
+
+class Router:
+    """
+    Chooses a replica per routing key and keeps hit-rate / balance statistics.
+    """
+
+    def __init__(
+        self,
+        replicas: Dict[str, httpx.AsyncClient],
+        vnodes: int = VNODES,
+        load_factor: float = LOAD_FACTOR,
+        max_failures: Optional[int] = MAX_FAILURES,
+        recent_keys: int = RECENT_KEYS,
+    ):
+        self.replicas = {name: Replica(name, client) for name, client in replicas.items()}
+        self.ring = HashRing(list(self.replicas), vnodes=vnodes)
+        self.load_factor = load_factor
+        self.max_failures = max_failures
+        self.recent_keys = recent_keys
+        self._recent: "OrderedDict[str, str]" = OrderedDict()
+
+        self.total = 0
+        self.affinity_hits = 0
+        self.cache_hits = 0
+        self.spillovers = 0
+        self.key_fallbacks = 0
+
+    # ---- Santé ----
+
+    def mark_success(self, replica: Replica) -> None:
+        replica.failures = 0
+        replica.healthy = True
+
+    def mark_failure(self, replica: Replica) -> None:
+        replica.failures += 1
+        # max_failures=None : pas d'éjection (aucun health check pour ré-admettre le replica)
+        if self.max_failures is not None and replica.failures >= self.max_failures:
+            replica.healthy = False
+
+    async def check_health(self) -> None:
+        async def _probe(replica: Replica) -> None:
+            try:
+                resp = await replica.client.get("/health", timeout=2.0)
+                ok = resp.status_code == 200
+            except Exception:
+                # toute erreur (transport, app ASGI, URL invalide...) compte comme un échec
+                ok = False
+            if ok:
+                self.mark_success(replica)
+            else:
+                self.mark_failure(replica)
+
+        await asyncio.gather(*(_probe(r) for r in self.replicas.values()))
+
+    # ---- Routage ----
+
+    def capacity(self) -> int:
+        """Maximum in-flight requests per replica (consistent hashing with bounded loads)."""
+        healthy = [r for r in self.replicas.values() if r.healthy]
+        in_flight = sum(r.in_flight for r in healthy)
+        return max(1, math.ceil(self.load_factor * (in_flight + 1) / max(1, len(healthy))))
+
+    def plan(self, key: str) -> Tuple[Optional[Replica], List[Replica]]:
+        """
+        Return (owner of the key, healthy replicas in the order they should be tried).
+        Replicas under the load bound come first, in ring order.
+        """
+        ring_order = [self.replicas[n] for n in self.ring.iter_nodes(key) if self.replicas[n].healthy]
+        if not ring_order:
+            return None, []
+        cap = self.capacity()
+        under = [r for r in ring_order if r.in_flight < cap]
+        over = [r for r in ring_order if r.in_flight >= cap]
+        return ring_order[0], under + over
+
+    def record(self, key: str, owner: Replica, chosen: Replica) -> None:
+        self.total += 1
+        chosen.requests += 1
+        if chosen is owner:
+            self.affinity_hits += 1
+        else:
+            self.spillovers += 1
+
+        if self._recent.get(key) == chosen.name:
+            self.cache_hits += 1
+        self._recent[key] = chosen.name
+        self._recent.move_to_end(key)
+        if len(self._recent) > self.recent_keys:
+            self._recent.popitem(last=False)
+
+    async def forward(
+        self,
+        key: str,
+        method: str,
+        path: str,
+        params,
+        headers: List[Tuple[str, str]],
+        body: bytes,
+    ) -> Tuple[Replica, httpx.Response]:
+        owner, ordered = self.plan(key)
+        if not ordered:
+            raise HTTPException(status_code=503, detail="No healthy backend replica.")
+
+        for replica in ordered:
+            replica.in_flight += 1
+            try:
+                resp = await replica.client.request(
+                    method, path, params=params, headers=headers, content=body
+                )
+            except httpx.ConnectError:
+                # la requête n'est jamais partie : on essaie le replica suivant sur l'anneau
+                self.mark_failure(replica)
+                continue
+            except httpx.TransportError as e:
+                self.mark_failure(replica)
+                raise HTTPException(status_code=502, detail=f"Backend replica error: {e}")
+            finally:
+                replica.in_flight -= 1
+
+            self.mark_success(replica)
+            self.record(key, owner, replica)
+            return replica, resp
+
+        raise HTTPException(status_code=502, detail="All backend replicas are unreachable.")
+
+    # ---- Statistiques ----
+
+    def stats(self) -> Dict:
+        counts = [r.requests for r in self.replicas.values()]
+        mean = statistics.fmean(counts) if counts else 0.0
+        return {
+            "requests": self.total,
+            "affinity_rate": self.affinity_hits / self.total if self.total else 0.0,
+            "cache_hit_rate": self.cache_hits / self.total if self.total else 0.0,
+            "spillovers": self.spillovers,
+            "routing_key_fallbacks": self.key_fallbacks,
+            "balance": {
+                "max_over_mean": max(counts) / mean if mean else 0.0,
+                "stdev": statistics.pstdev(counts) if counts else 0.0,
+            },
+            "replicas": {
+                r.name: {
+                    "healthy": r.healthy,
+                    "in_flight": r.in_flight,
+                    "requests": r.requests,
+                    "failures": r.failures,
+                }
+                for r in self.replicas.values()
+            },
+        }
+
+
+async def routing_key(request: Request, body: bytes) -> Tuple[str, bool]:
+    """
+    Hash of path + query parameters + uploaded content.
+    Multipart bodies are hashed on their fields, not on the raw body,
+    because the multipart boundary changes on every upload.
+
+    Returns (key, fallback) where `fallback` is True when a multipart body
+    could not be parsed and the raw body was hashed instead (no affinity).
+    """
+    digest = hashlib.sha256(request.url.path.encode("utf-8"))
+    for name, value in sorted(request.query_params.multi_items()):
+        digest.update(f"&{name}={value}".encode("utf-8"))
+
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        try:
+            form = await request.form()
+        except (MultiPartException, StarletteHTTPException) as e:
+            logger.warning("Unparsable multipart body, routing on raw body hash: %s", e)
+            digest.update(body)
+            return digest.hexdigest(), True
+
+        for name, value in sorted(form.multi_items(), key=lambda item: item[0]):
+            digest.update(name.encode("utf-8"))
+            if isinstance(value, UploadFile):
+                digest.update(await value.read())
+            else:
+                digest.update(str(value).encode("utf-8"))
+        await form.close()
+        return digest.hexdigest(), False
+
+    digest.update(body)
+    return digest.hexdigest(), False
+
+
+def proxied_response(method: str, replica: Replica, resp: httpx.Response) -> Response:
+    """
+    Build the client response from a replica response, keeping repeated
+    headers (e.g. Set-Cookie) and the replica's Content-Length for HEAD.
+    """
+    raw_headers = [
+        (k.lower().encode("latin-1"), v.encode("latin-1"))
+        for k, v in resp.headers.multi_items()
+        if k.lower() not in RESPONSE_EXCLUDED_HEADERS
+    ]
+    # pas de corps pour 1xx / 204 / 304, donc pas de content-length
+    if resp.status_code >= 200 and resp.status_code not in (204, 304):
+        if method == "HEAD" and "content-length" in resp.headers:
+            content_length = resp.headers["content-length"]
+        else:
+            content_length = str(len(resp.content))
+        raw_headers.append((b"content-length", content_length.encode("latin-1")))
+    raw_headers.append((b"x-gateway-replica", replica.name.encode("latin-1")))
+
+    response = Response(content=resp.content, status_code=resp.status_code)
+    response.raw_headers = raw_headers
+    return response
+
+
+async def _health_loop(router: Router, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await router.check_health()
+        except Exception:
+            # une ronde ratée ne doit pas arrêter les health checks
+            logger.exception("Health check round failed")
+
+
+def create_app(
+    replicas: Optional[Dict[str, httpx.AsyncClient]] = None,
+    health_interval: float = HEALTH_INTERVAL,
+    **router_options,
+) -> FastAPI:
+    """
+    Build the gateway. `replicas` maps a replica name to an httpx client
+    (defaults to one client per URL in GATEWAY_REPLICAS); the gateway closes them on shutdown.
+    `health_interval <= 0` disables the background health checks, and with them ejection.
+    """
+    if replicas is None:
+        replicas = {
+            url: httpx.AsyncClient(base_url=url, timeout=30.0) for url in GATEWAY_REPLICAS
+        }
+    if health_interval <= 0:
+        router_options["max_failures"] = None
+    router = Router(replicas, **router_options)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        task = asyncio.create_task(_health_loop(router, health_interval)) if health_interval > 0 else None
+        yield
+        if task is not None:
+            task.cancel()
+        for replica in router.replicas.values():
+            await replica.client.aclose()
+
+    # docs/openapi désactivés ici : ceux des replicas sont servis via le proxy
+    app = FastAPI(
+        title="Face Detection Gateway",
+        docs_url=None,
+        redoc_url=None,
+        openapi_url=None,
+        lifespan=lifespan,
+    )
+    app.state.router = router
+
+    @app.get("/health")
+    async def health_check():
+        """Healthy while at least one replica is healthy."""
+        if not any(r.healthy for r in router.replicas.values()):
+            raise HTTPException(status_code=503, detail="No healthy backend replica.")
+        return {"status": "healthy"}
+
+    @app.get("/gateway/stats")
+    async def gateway_stats():
+        """Routing statistics: affinity and cache hit rates, spillovers, per-replica balance."""
+        return router.stats()
+
+    @app.api_route(
+        "/{path:path}",
+        methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"],
+        include_in_schema=False,
+    )
+    async def proxy(request: Request, path: str):
+        body = await request.body()
+        key, fallback = await routing_key(request, body)
+        if fallback:
+            router.key_fallbacks += 1
+        # liste et non dict : les en-têtes répétés sont transmis tels quels
+        headers = [
+            (k, v) for k, v in request.headers.items() if k.lower() not in REQUEST_EXCLUDED_HEADERS
+        ]
+
+        replica, resp = await router.forward(
+            key,
+            request.method,
+            request.url.path,
+            request.query_params.multi_items(),
+            headers,
+            body,
+        )
+
+        return proxied_response(request.method, replica, resp)
+
+    return app
+
+
+app = create_app()
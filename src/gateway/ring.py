@@ -0,0 +1,64 @@
+# src/gateway/ring.py
+
+import bisect
+import hashlib
+from typing import Dict, Iterator, List
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes.
+
+    Each node is placed `vnodes` times on the ring; a key belongs to the first
+    node found clockwise from its hash. Removing a node only moves the keys it owned.
+    """
+
+    def __init__(self, nodes: List[str] = (), vnodes: int = 100):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: Dict[int, str] = {}
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(set(self._owners.values()))
+
+    def add(self, node: str) -> None:
+        for idx in range(self.vnodes):
+            point = _hash(f"{node}#{idx}")
+            if point in self._owners:
+                continue
+            bisect.insort(self._points, point)
+            self._owners[point] = node
+
+    def remove(self, node: str) -> None:
+        self._owners = {p: n for p, n in self._owners.items() if n != node}
+        self._points = sorted(self._owners)
+
+    def iter_nodes(self, key: str) -> Iterator[str]:
+        """
+        Yield the distinct nodes clockwise from `key`: the owner first, then the fallbacks.
+        """
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _hash(key))
+        seen = set()
+        total = len(set(self._owners.values()))
+        for offset in range(len(self._points)):
+            node = self._owners[self._points[(start + offset) % len(self._points)]]
+            if node in seen:
+                continue
+            seen.add(node)
+            yield node
+            if len(seen) == total:
+                return
+
+    def get(self, key: str) -> str:
+        for node in self.iter_nodes(key):
+            return node
+        raise LookupError("The hash ring is empty.")
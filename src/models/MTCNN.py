@@ -3,8 +3,26 @@ from mtcnn import MTCNN
 from PIL import Image
 from io import BytesIO
 import numpy as np
+import os
+import tensorflow as tf
 from typing import List, Dict, Tuple, Any
 
+
+def _configure_tf_threads() -> None:
+    """
+    Applique TF_INTRA_OP_THREADS / TF_INTER_OP_THREADS (0 ou absent = défaut TensorFlow).
+    Doit être appelé avant la création du détecteur : TensorFlow fige ses pools
+    de threads à l'initialisation du runtime.
+    """
+    intra = int(os.environ.get("TF_INTRA_OP_THREADS") or 0)
+    inter = int(os.environ.get("TF_INTER_OP_THREADS") or 0)
+    if intra > 0:
+        tf.config.threading.set_intra_op_parallelism_threads(intra)
+    if inter > 0:
+        tf.config.threading.set_inter_op_parallelism_threads(inter)
+
+
+_configure_tf_threads()
 detector = MTCNN()
 
 
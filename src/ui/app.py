@@ -1,37 +1,50 @@
+import hashlib
 import io
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
 import requests
 import streamlit as st
-from PIL import Image
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle, Circle
+from PIL import Image, ImageDraw
+from requests.adapters import HTTPAdapter
 
 API_URL_DEFAULT = os.getenv("API_URL", "http://backend:8000")
+# plus grand côté (en pixels) de l'image envoyée à l'API
+MAX_UPLOAD_SIDE = int(os.getenv("MAX_UPLOAD_SIDE", "1024"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+
+
+# ---------- Client HTTP ----------
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """
+    Session HTTP partagée entre reruns et utilisateurs (keep-alive + pool de connexions).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
 
 # ---------- Utils d'affichage ----------
 
-def display_detections(
+def draw_detections(
     image_bytes: bytes,
     boxes: List[List[float]],
     keypoints: Optional[List[Optional[Dict]]] = None,
     scores: Optional[List[Optional[float]]] = None,
     show_keypoints: bool = True,
     show_scores: bool = True,
-):
+) -> Image.Image:
     """
-    Affiche l'image avec les bounding boxes, keypoints et scores optionnels.
+    Dessine les bounding boxes, keypoints et scores sur l'image avec PIL.
     """
-    if not boxes:
-        st.info("No faces detected.")
-        return
-
     image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-
-    fig, ax = plt.subplots(1, 1, figsize=(8, 8))
-    ax.imshow(image)
+    draw = ImageDraw.Draw(image)
+    # épaisseur proportionnelle à la taille de l'image
+    width = max(2, round(max(image.size) / 400))
 
     for idx, box in enumerate(boxes):
         try:
@@ -40,39 +53,52 @@ def display_detections(
             continue
 
         # Rectangle pour la face
-        rect = Rectangle(
-            (x1, y1),
-            x2 - x1,
-            y2 - y1,
-            linewidth=2,
-            edgecolor="lime",
-            facecolor="none",
-        )
-        ax.add_patch(rect)
+        draw.rectangle((x1, y1, x2, y2), outline="lime", width=width)
 
         # Score (si dispo)
         if scores and show_scores and idx < len(scores) and scores[idx] is not None:
-            ax.text(
-                x1,
-                max(y1 - 5, 0),
-                f"{scores[idx]:.2f}",
-                fontsize=10,
-                color="yellow",
-                bbox=dict(facecolor="black", alpha=0.5, pad=1),
-            )
+            text = f"{scores[idx]:.2f}"
+            text_pos = (x1, max(y1 - 12, 0))
+            draw.rectangle(draw.textbbox(text_pos, text), fill="black")
+            draw.text(text_pos, text, fill="yellow")
 
         # Keypoints (si dispo)
         if keypoints and show_keypoints and idx < len(keypoints) and keypoints[idx]:
+            r = width + 1
             for _, pt in keypoints[idx].items():
                 try:
                     px, py = pt
-                    circ = Circle((px, py), radius=2, color="red")
-                    ax.add_patch(circ)
+                    draw.ellipse((px - r, py - r, px + r, py + r), fill="red")
                 except Exception:
                     continue
 
-    ax.axis("off")
-    st.pyplot(fig)
+    return image
+
+
+def display_detections(
+    image_bytes: bytes,
+    boxes: List[List[float]],
+    keypoints: Optional[List[Optional[Dict]]] = None,
+    scores: Optional[List[Optional[float]]] = None,
+    show_keypoints: bool = True,
+    show_scores: bool = True,
+):
+    """
+    Affiche l'image avec les bounding boxes, keypoints et scores optionnels.
+    """
+    if not boxes:
+        st.info("No faces detected.")
+        return
+
+    image = draw_detections(
+        image_bytes,
+        boxes,
+        keypoints=keypoints,
+        scores=scores,
+        show_keypoints=show_keypoints,
+        show_scores=show_scores,
+    )
+    st.image(image)
 
 
 def read_image_bytes(image_input):
@@ -91,6 +117,84 @@ def read_image_bytes(image_input):
     return image_bytes, filename, mime
 
 
+def image_digest(image_bytes: bytes) -> str:
+    """Empreinte du contenu de l'image, utilisée comme clé de cache."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+# ---------- Préparation de l'upload ----------
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def prepare_upload(
+    image_hash: str,
+    _image_bytes: bytes,
+    max_side: int = MAX_UPLOAD_SIDE,
+) -> Tuple[bytes, float]:
+    """
+    Réduit l'image pour que son plus grand côté ne dépasse pas `max_side`.
+    Retourne (bytes à envoyer, facteur d'échelle appliqué). Le facteur vaut 1.0
+    si l'image est déjà assez petite : les bytes d'origine sont alors envoyés tels quels.
+    """
+    image = Image.open(io.BytesIO(_image_bytes))
+    original_size = image.size
+    if max(original_size) <= max_side:
+        return _image_bytes, 1.0
+
+    # décodage JPEG directement à une résolution réduite quand c'est possible
+    image.draft("RGB", (max_side, max_side))
+    image = image.convert("RGB")
+    image.thumbnail((max_side, max_side))
+
+    buf = io.BytesIO()
+    image.save(buf, format="JPEG", quality=90)
+    return buf.getvalue(), image.size[0] / original_size[0]
+
+
+def _rescale_point(point, factor: float):
+    return [round(v * factor) for v in point]
+
+
+def rescale_result(result: Dict, factor: float) -> Dict:
+    """
+    Multiplie les coordonnées (boxes, keypoints) d'une réponse de l'API par `factor`,
+    par exemple pour les ramener à l'image d'origine.
+    """
+    if factor == 1.0:
+        return result
+
+    def _keypoints(kps):
+        if not kps:
+            return kps
+        return {name: _rescale_point(pt, factor) for name, pt in kps.items()}
+
+    rescaled = dict(result)
+    if "boxes" in result:
+        rescaled["boxes"] = [_rescale_point(b, factor) for b in result["boxes"]]
+    if "keypoints" in result:
+        rescaled["keypoints"] = [_keypoints(k) for k in result["keypoints"]]
+    if "detections" in result:
+        rescaled["detections"] = [
+            {
+                **det,
+                "box": _rescale_point(det["box"], factor) if det.get("box") else det.get("box"),
+                "keypoints": _keypoints(det.get("keypoints")),
+            }
+            for det in result["detections"]
+        ]
+    return rescaled
+
+
+def upload_params(params: Dict, scale: float) -> Dict:
+    """
+    Paramètres de détection pour l'image réduite : la taille minimale
+    est exprimée en pixels de l'image envoyée.
+    """
+    api_params = dict(params)
+    if scale != 1.0:
+        api_params["min_face_size"] = max(1, round(params["min_face_size"] * scale))
+    return api_params
+
+
 def send_image_to_api(
     image_bytes: bytes,
     api_url: str,
@@ -108,7 +212,7 @@ def send_image_to_api(
 
     files = {"file": (filename, image_bytes, mime)}
 
-    response = requests.post(
+    response = get_http_session().post(
         api_url,
         files=files,
         headers=headers,
@@ -119,6 +223,36 @@ def send_image_to_api(
     return response.json()
 
 
+@st.cache_data(max_entries=256, ttl=3600, show_spinner=False)
+def detect_faces_cached(
+    image_hash: str,
+    api_url: str,
+    token: Optional[str],
+    params: Dict,
+    _image_bytes: bytes,
+    filename: str = "image.jpg",
+    mime: str = "image/jpeg",
+) -> Dict:
+    """
+    Appelle l'API sur la version réduite de l'image (voir `prepare_upload`).
+    Les coordonnées renvoyées restent dans l'espace de cette image réduite.
+    Le résultat est mis en cache par (empreinte de l'image, endpoint, token, paramètres) ;
+    les erreurs HTTP ne sont pas mises en cache.
+    """
+    upload_bytes, scale = prepare_upload(image_hash, _image_bytes)
+    if scale != 1.0:
+        mime = "image/jpeg"
+
+    return send_image_to_api(
+        image_bytes=upload_bytes,
+        api_url=api_url,
+        token=token,
+        filename=filename,
+        mime=mime,
+        params=upload_params(params, scale),
+    )
+
+
 # ---------- App principale Streamlit ----------
 
 def main():
@@ -229,15 +363,20 @@ def main():
         if score_min is not None:
             params["score_min"] = score_min
 
+        image_hash = image_digest(image_bytes)
+        # image réduite envoyée à l'API : sert aussi à l'affichage (mêmes coordonnées)
+        upload_bytes, scale = prepare_upload(image_hash, image_bytes)
+
         with st.spinner("Sending image to detection API..."):
             try:
-                result = send_image_to_api(
-                    image_bytes=image_bytes,
-                    api_url=api_url,
-                    token=api_key_input or None,
+                result = detect_faces_cached(
+                    image_hash,
+                    api_url,
+                    api_key_input or None,
+                    params,
+                    image_bytes,
                     filename=filename,
                     mime=mime,
-                    params=params,
                 )
             except requests.exceptions.HTTPError as http_err:
                 st.error(f"HTTP error from API: {http_err} ({http_err.response.text})")
@@ -265,7 +404,7 @@ def main():
 
         # Affichage graphique
         display_detections(
-            image_bytes=image_bytes,
+            image_bytes=upload_bytes,
             boxes=boxes,
             keypoints=keypoints,
             scores=scores,
@@ -275,7 +414,8 @@ def main():
 
         # Affichage brute JSON dans un expander pour debug
         with st.expander("Raw API response"):
-            st.json(result)
+            # coordonnées ramenées à l'image d'origine
+            st.json(rescale_result(result, 1.0 / scale))
 
 
 if __name__ == "__main__":
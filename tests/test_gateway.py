@@ -0,0 +1,236 @@
+# tests/test_gateway.py
+
+import asyncio
+import unittest
+
+import httpx
+from fastapi import FastAPI, File, Request, Response, UploadFile
+
+from src.gateway.main import create_app
+from src.gateway.ring import HashRing
+
+
+def make_backend(name: str, release: asyncio.Event = None) -> FastAPI:
+    """In-process replica answering /health and /detect."""
+    backend = FastAPI()
+
+    @backend.get("/health")
+    async def health_check():
+        return {"status": "healthy"}
+
+    @backend.post("/detect")
+    async def detect(file: UploadFile = File(...)):
+        if release is not None:
+            await release.wait()
+        return {"replica": name, "size": len(await file.read())}
+
+    return backend
+
+
+def asgi_client(app: FastAPI, name: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url=f"http://{name}")
+
+
+class DownTransport(httpx.AsyncBaseTransport):
+    """Transport refusing connections until `up` is set."""
+
+    def __init__(self, app: FastAPI):
+        self.up = False
+        self._asgi = httpx.ASGITransport(app=app)
+
+    async def handle_async_request(self, request):
+        if not self.up:
+            raise httpx.ConnectError("connection refused", request=request)
+        return await self._asgi.handle_async_request(request)
+
+
+def multipart(content: bytes, boundary: str):
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="face.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + content + f"\r\n--{boundary}--\r\n".encode()
+    headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+    return body, headers
+
+
+class HashRingTest(unittest.TestCase):
+    def test_removing_a_node_only_moves_its_keys(self):
+        ring = HashRing(["a", "b", "c"])
+        keys = [f"key-{i}" for i in range(5000)]
+        before = {k: ring.get(k) for k in keys}
+
+        ring.remove("b")
+        after = {k: ring.get(k) for k in keys}
+
+        self.assertEqual(ring.nodes, ["a", "c"])
+        for key in keys:
+            if before[key] != "b":
+                self.assertEqual(after[key], before[key])
+            else:
+                self.assertIn(after[key], ("a", "c"))
+
+    def test_iter_nodes_yields_each_node_once(self):
+        ring = HashRing(["a", "b", "c"])
+        nodes = list(ring.iter_nodes("some-key"))
+        self.assertEqual(sorted(nodes), ["a", "b", "c"])
+        self.assertEqual(nodes[0], ring.get("some-key"))
+
+
+class GatewayTest(unittest.TestCase):
+    def test_repeated_upload_with_new_boundary_hits_same_replica(self):
+        async def scenario():
+            replicas = {n: asgi_client(make_backend(n), n) for n in ("r1", "r2", "r3")}
+            gateway = create_app(replicas, health_interval=0)
+            async with asgi_client(gateway, "gateway") as client:
+                served_by = []
+                for boundary in ("boundary-one", "boundary-two"):
+                    body, headers = multipart(b"same image bytes", boundary)
+                    resp = await client.post("/detect", content=body, headers=headers)
+                    self.assertEqual(resp.status_code, 200)
+                    served_by.append(resp.headers["X-Gateway-Replica"])
+                return served_by, gateway.state.router.stats()
+
+        served_by, stats = asyncio.run(scenario())
+        self.assertEqual(served_by[0], served_by[1])
+        self.assertEqual(stats["cache_hit_rate"], 0.5)
+        self.assertEqual(stats["routing_key_fallbacks"], 0)
+
+    def test_unreachable_replica_fails_over_then_is_ejected_and_readmitted(self):
+        down = DownTransport(make_backend("down"))
+
+        async def scenario():
+            replicas = {
+                "up": asgi_client(make_backend("up"), "up"),
+                "down": httpx.AsyncClient(transport=down, base_url="http://down"),
+            }
+            gateway = create_app(replicas, health_interval=3600, max_failures=2)
+            router = gateway.state.router
+            async with asgi_client(gateway, "gateway") as client:
+                for i in range(20):
+                    resp = await client.post("/detect", files={"file": ("f.jpg", bytes([i]) * 10)})
+                    self.assertEqual(resp.status_code, 200)
+                    self.assertEqual(resp.json()["replica"], "up")
+                ejected = not router.replicas["down"].healthy
+
+                down.up = True
+                await router.check_health()
+                return ejected, router.replicas["down"].healthy
+
+        ejected, readmitted = asyncio.run(scenario())
+        self.assertTrue(ejected)
+        self.assertTrue(readmitted)
+
+    def test_no_ejection_without_health_checks(self):
+        async def scenario():
+            replicas = {
+                "up": asgi_client(make_backend("up"), "up"),
+                "down": httpx.AsyncClient(transport=DownTransport(make_backend("down")), base_url="http://down"),
+            }
+            gateway = create_app(replicas, health_interval=0, max_failures=1)
+            async with asgi_client(gateway, "gateway") as client:
+                for i in range(20):
+                    resp = await client.post("/detect", files={"file": ("f.jpg", bytes([i]) * 10)})
+                    self.assertEqual(resp.status_code, 200)
+            return gateway.state.router.replicas["down"]
+
+        down = asyncio.run(scenario())
+        self.assertTrue(down.healthy)
+        self.assertGreater(down.failures, 0)
+
+    def test_health_probe_errors_do_not_escape(self):
+        broken = FastAPI()
+
+        @broken.get("/health")
+        async def health_check():
+            raise RuntimeError("boom")
+
+        async def scenario():
+            gateway = create_app({"broken": asgi_client(broken, "broken")}, health_interval=3600, max_failures=1)
+            router = gateway.state.router
+            await router.check_health()
+            return router.replicas["broken"].healthy
+
+        self.assertFalse(asyncio.run(scenario()))
+
+    def test_request_content_encoding_is_forwarded(self):
+        echo = FastAPI()
+
+        @echo.post("/echo")
+        async def echo_headers(request: Request):
+            return {"content_encoding": request.headers.get("content-encoding")}
+
+        async def scenario():
+            gateway = create_app({"echo": asgi_client(echo, "echo")}, health_interval=0)
+            async with asgi_client(gateway, "gateway") as client:
+                return await client.post("/echo", content=b"compressed", headers={"Content-Encoding": "gzip"})
+
+        resp = asyncio.run(scenario())
+        self.assertEqual(resp.json()["content_encoding"], "gzip")
+
+    def test_repeated_response_headers_and_head_content_length(self):
+        backend = FastAPI()
+
+        @backend.get("/cookies")
+        async def cookies():
+            response = Response(content=b"ok")
+            response.set_cookie("a", "1")
+            response.set_cookie("b", "2")
+            return response
+
+        @backend.api_route("/file", methods=["GET", "HEAD"])
+        async def file():
+            return Response(content=b"x" * 42, media_type="application/octet-stream")
+
+        async def scenario():
+            gateway = create_app({"r1": asgi_client(backend, "r1")}, health_interval=0)
+            async with asgi_client(gateway, "gateway") as client:
+                return await client.get("/cookies"), await client.head("/file")
+
+        cookies_resp, head_resp = asyncio.run(scenario())
+        self.assertEqual(len(cookies_resp.headers.get_list("set-cookie")), 2)
+        self.assertEqual(head_resp.status_code, 200)
+        self.assertEqual(head_resp.headers["content-length"], "42")
+        self.assertEqual(head_resp.headers["content-type"], "application/octet-stream")
+
+    def test_unparsable_multipart_is_counted_as_fallback(self):
+        async def scenario():
+            gateway = create_app({"r1": asgi_client(make_backend("r1"), "r1")}, health_interval=0)
+            async with asgi_client(gateway, "gateway") as client:
+                await client.post(
+                    "/detect",
+                    content=b"not a multipart body",
+                    headers={"Content-Type": "multipart/form-data"},
+                )
+            return gateway.state.router.stats()
+
+        self.assertEqual(asyncio.run(scenario())["routing_key_fallbacks"], 1)
+
+    def test_bounded_load_spills_over_hot_key(self):
+        async def scenario():
+            release = asyncio.Event()
+            replicas = {n: asgi_client(make_backend(n, release), n) for n in ("r1", "r2", "r3")}
+            gateway = create_app(replicas, health_interval=0, load_factor=1.25)
+            router = gateway.state.router
+
+            async def release_later():
+                await asyncio.sleep(0.1)
+                release.set()
+
+            async with asgi_client(gateway, "gateway") as client:
+                requests = [
+                    client.post("/detect", files={"file": ("f.jpg", b"hot image")}) for _ in range(9)
+                ]
+                responses, _ = await asyncio.gather(asyncio.gather(*requests), release_later())
+            return responses, router.stats()
+
+        responses, stats = asyncio.run(scenario())
+        self.assertTrue(all(r.status_code == 200 for r in responses))
+        self.assertGreater(stats["spillovers"], 0)
+        served = [r["requests"] for r in stats["replicas"].values()]
+        self.assertEqual(sum(served), 9)
+        self.assertLess(max(served), 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
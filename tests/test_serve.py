@@ -0,0 +1,92 @@
+# tests/test_serve.py
+
+import unittest
+
+from src.api.serve import (
+    BenchmarkResult,
+    WorkerTopology,
+    benchmark_topology,
+    candidate_topologies,
+    parse_cpu_set,
+    select_best,
+    tune,
+    worker_cpu_sets,
+)
+
+
+class WorkerTopologyTest(unittest.TestCase):
+    def test_rejects_invalid_values(self):
+        with self.assertRaises(ValueError):
+            WorkerTopology(workers=0)
+        with self.assertRaises(ValueError):
+            WorkerTopology(intra_op_threads=-1)
+        with self.assertRaises(ValueError):
+            WorkerTopology(inter_op_threads=-1)
+
+
+class WorkerCpuSetsTest(unittest.TestCase):
+    def test_no_affinity_means_no_pinning(self):
+        self.assertEqual(worker_cpu_sets(WorkerTopology(workers=3)), [None, None, None])
+
+    def test_auto_splits_cpus_into_contiguous_blocks(self):
+        sets = worker_cpu_sets(WorkerTopology(workers=3, cpu_affinity="auto"), cpus=list(range(8)))
+        self.assertEqual(sets, [{0, 1}, {2, 3}, {4, 5}])
+
+    def test_auto_wraps_around_when_more_workers_than_cpus(self):
+        sets = worker_cpu_sets(WorkerTopology(workers=5, cpu_affinity="auto"), cpus=[0, 1])
+        self.assertEqual(sets, [{0}, {1}, {0}, {1}, {0}])
+
+    def test_explicit_sets(self):
+        topology = WorkerTopology(workers=2, cpu_affinity="0-3;4,6")
+        self.assertEqual(worker_cpu_sets(topology, cpus=list(range(8))), [{0, 1, 2, 3}, {4, 6}])
+
+    def test_explicit_sets_must_match_worker_count(self):
+        with self.assertRaises(ValueError):
+            worker_cpu_sets(WorkerTopology(workers=3, cpu_affinity="0;1"), cpus=[0, 1, 2])
+
+    def test_explicit_sets_must_use_available_cpus(self):
+        with self.assertRaisesRegex(ValueError, "API_CPU_AFFINITY"):
+            worker_cpu_sets(WorkerTopology(workers=2, cpu_affinity="0;9"), cpus=[0, 1])
+
+    def test_parse_cpu_set(self):
+        self.assertEqual(parse_cpu_set("0-2, 5"), {0, 1, 2, 5})
+        with self.assertRaises(ValueError):
+            parse_cpu_set(" , ")
+
+
+class TuningTest(unittest.TestCase):
+    def test_candidates_never_oversubscribe(self):
+        candidates = candidate_topologies(6)
+        self.assertIn(WorkerTopology(workers=1, intra_op_threads=6, inter_op_threads=2, cpu_affinity="auto"), candidates)
+        self.assertIn(WorkerTopology(workers=6, intra_op_threads=1, inter_op_threads=1, cpu_affinity="auto"), candidates)
+        for topology in candidates:
+            self.assertLessEqual(topology.workers * topology.intra_op_threads, 6)
+        self.assertTrue(all(t.cpu_affinity == "" for t in candidate_topologies(6, pin=False)))
+
+    def test_select_best_ignores_failed_layouts(self):
+        fast = BenchmarkResult(WorkerTopology(workers=4), throughput=40.0, p50_ms=90.0, p95_ms=120.0)
+        snappy = BenchmarkResult(WorkerTopology(workers=1), throughput=12.0, p50_ms=70.0, p95_ms=80.0)
+        failed = BenchmarkResult(
+            WorkerTopology(workers=2), 0.0, float("inf"), float("inf"), error="worker exited with code 9"
+        )
+        self.assertIs(select_best([fast, snappy, failed], "throughput"), fast)
+        self.assertIs(select_best([fast, snappy, failed], "latency"), snappy)
+
+    def test_select_best_raises_when_every_layout_failed(self):
+        failed = BenchmarkResult(WorkerTopology(), 0.0, float("inf"), float("inf"), error="boom")
+        with self.assertRaises(RuntimeError):
+            select_best([failed], "throughput")
+
+    def test_failing_workers_mark_layout_failed(self):
+        # les workers échouent (image invalide ou détecteur indisponible) : pas de blocage
+        result = benchmark_topology(WorkerTopology(workers=2), b"not an image", total_requests=2, timeout=120)
+        self.assertIsNotNone(result.error)
+        self.assertEqual(result.throughput, 0.0)
+
+    def test_tune_rejects_invalid_image(self):
+        with self.assertRaises(ValueError):
+            tune(b"not an image")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+# tests/test_ui.py
+
+import io
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from src.ui import app
+
+
+def jpeg_bytes(width: int, height: int) -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), "white").save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+class PrepareUploadTest(unittest.TestCase):
+    def test_large_image_is_downscaled(self):
+        data = jpeg_bytes(4000, 3000)
+        upload, scale = app.prepare_upload(app.image_digest(data), data, max_side=1000)
+
+        self.assertEqual(Image.open(io.BytesIO(upload)).size, (1000, 750))
+        self.assertAlmostEqual(scale, 0.25)
+
+    def test_small_image_is_sent_unchanged(self):
+        data = jpeg_bytes(640, 480)
+        upload, scale = app.prepare_upload(app.image_digest(data), data, max_side=1000)
+
+        self.assertIs(upload, data)
+        self.assertEqual(scale, 1.0)
+
+
+class RescaleResultTest(unittest.TestCase):
+    def test_boxes_and_keypoints(self):
+        result = {"boxes": [[10, 20, 30, 40]], "keypoints": [{"nose": [15, 25]}, None]}
+        self.assertEqual(
+            app.rescale_result(result, 4.0),
+            {"boxes": [[40, 80, 120, 160]], "keypoints": [{"nose": [60, 100]}, None]},
+        )
+
+    def test_detections(self):
+        result = {"detections": [{"box": [1, 2, 3, 4], "score": 0.9, "keypoints": {"left_eye": [2, 3]}}]}
+        self.assertEqual(
+            app.rescale_result(result, 2.0),
+            {"detections": [{"box": [2, 4, 6, 8], "score": 0.9, "keypoints": {"left_eye": [4, 6]}}]},
+        )
+
+    def test_unit_factor_is_pass_through(self):
+        result = {"boxes": [[1, 2, 3, 4]]}
+        self.assertIs(app.rescale_result(result, 1.0), result)
+
+
+class DetectFacesCachedTest(unittest.TestCase):
+    def test_min_face_size_follows_upload_scale(self):
+        self.assertEqual(app.upload_params({"min_face_size": 40}, 0.25), {"min_face_size": 10})
+        self.assertEqual(app.upload_params({"min_face_size": 2}, 0.1), {"min_face_size": 1})
+        self.assertEqual(app.upload_params({"min_face_size": 40}, 1.0), {"min_face_size": 40})
+
+    def test_downscaled_upload_keeps_api_coordinates(self):
+        data = jpeg_bytes(3000, 2000)
+        api_result = {"boxes": [[10, 10, 50, 50]]}
+        with mock.patch.object(app, "send_image_to_api", return_value=api_result) as send:
+            result = app.detect_faces_cached(
+                app.image_digest(data),
+                "http://backend:8000/detect",
+                None,
+                {"min_face_size": 60, "threshold_pnet": 0.6},
+                data,
+                filename="big.png",
+                mime="image/png",
+            )
+
+        kwargs = send.call_args.kwargs
+        scale = app.MAX_UPLOAD_SIDE / 3000
+        self.assertEqual(kwargs["params"]["min_face_size"], round(60 * scale))
+        self.assertEqual(kwargs["params"]["threshold_pnet"], 0.6)
+        self.assertEqual(kwargs["mime"], "image/jpeg")
+        self.assertEqual(max(Image.open(io.BytesIO(kwargs["image_bytes"])).size), app.MAX_UPLOAD_SIDE)
+        # coordonnées dans l'espace de l'image réduite, utilisées telles quelles pour l'affichage
+        self.assertEqual(result, api_result)
+
+
+class DrawDetectionsTest(unittest.TestCase):
+    def test_draws_on_given_image_size(self):
+        image = app.draw_detections(jpeg_bytes(800, 600), [[10, 10, 100, 100]], [{"nose": [50, 50]}], [0.97])
+        self.assertEqual(image.size, (800, 600))
+        self.assertNotEqual(image.getpixel((10, 50)), (255, 255, 255))
+
+
+if __name__ == "__main__":
+    unittest.main()